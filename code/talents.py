@@ -9,6 +9,8 @@ from itertools import count, islice, product
 import sys
 import xml.etree.ElementTree as ET
 
+import numpy as np
+
 
 class Step(Enum):
     TALENT = "talent"
@@ -22,24 +24,45 @@ class Step(Enum):
     @classmethod
     def from_text(cls, text):
         try:
-            return [v for k, v in cls.__members__.items() if v.value == text][0]
-        except Exception:
+            return step_by_value[text]
+        except KeyError:
             raise ValueError(f"{text} is not a valid {cls.__name__} value")
 
 
-class TalentCounter(dict):
+step_index = {step: idx for idx, step in enumerate(Step)}
+step_by_value = {step.value: step for step in Step}
+
+
+class TalentCounter:
+    __slots__ = ("_v",)
+
     def __init__(self):
-        super(TalentCounter, self).__init__({step: 0 for step in Step})
+        self._v = [0] * len(Step)
 
     def add(self, rhs):
         if isinstance(rhs, Step):
-            self[rhs] += 1
+            self._v[step_index[rhs]] += 1
         elif isinstance(rhs, TalentCounter):
-            for k, v in rhs.items():
-                self[k] += v
+            for i, v in enumerate(rhs._v):
+                self._v[i] += v
         else:
             raise TypeError("Bad type of rhs argument in add()")
 
+    def __getitem__(self, step):
+        return self._v[step_index[step]]
+
+    def items(self):
+        return zip(Step, self._v)
+
+    def as_array(self):
+        return np.array(self._v, dtype=np.int32)
+
+    @classmethod
+    def from_array(cls, values):
+        counter = cls()
+        counter._v = [int(v) for v in values]
+        return counter
+
     def __repr__(self):
         entries = [
             f"{step}: {count}" for step, count in self.items() if count > 0
@@ -51,18 +74,24 @@ class ClassTalents:
     @classmethod
     def from_xml(cls, xml):
         talents = cls(xml.get("name"))
-        for step in xml.findall("*"):
-            try:
-                talents.count.add(Step.from_text(step.tag))
-            except ValueError:
-                if step.tag == "split":
-                    split = []
-                    for branch in step.findall("branch"):
-                        b = TalentCounter()
-                        for s in branch.findall("*"):
-                            b.add(Step.from_text(s.tag))
-                        split.append(b)
-                    talents.branches.append(split)
+        for child in xml:
+            if child.tag == "split":
+                split = []
+                for branch in child:
+                    if branch.tag != "branch":
+                        continue
+                    b = TalentCounter()
+                    for s in branch:
+                        b.add(Step.from_text(s.tag))
+                    split.append(b)
+                talents.branches.append(split)
+            elif child.tag in step_by_value:
+                talents.count.add(step_by_value[child.tag])
+        talents._count_vec = talents.count.as_array()
+        talents._branch_vecs = np.array(
+            [[b.as_array() for b in split] for split in talents.branches],
+            dtype=np.int32,
+        ).reshape(len(talents.branches), 2, len(Step))
         return talents
 
     def __init__(self, name):
@@ -71,17 +100,36 @@ class ClassTalents:
         self.name = name
         self.count = TalentCounter()
         self.branches = []
+        self._count_vec = np.zeros(len(Step), dtype=np.int32)
+        self._branch_vecs = np.zeros((0, 2, len(Step)), dtype=np.int32)
 
     def count_path(self, path):
+        return TalentCounter.from_array(self.count_path_vec(path))
+
+    def count_path_vec(self, path):
         if len(path) != len(self.branches):
             raise ValueError(
                 f"Required path of length {len(self.branches)}, got {len(path)}"
             )
-        result = TalentCounter()
-        result.add(self.count)
-        for split, where in zip(self.branches, path):
-            result.add(split[int(where)])
-        return result
+        picked = self._branch_vecs[np.arange(len(self.branches)), np.asarray(path, dtype=np.intp)]
+        return self._count_vec + picked.sum(axis=0)
+
+    def branch_counts(self):
+        """Return a (num_branches, 2, len(Step)) array of per-option counts."""
+        return self._branch_vecs
+
+    def count_paths(self, paths):
+        """Count talents for all rows of `paths` at once.
+
+        `paths` is an integer array of shape (num_paths, num_branches); the
+        result has shape (num_paths, len(Step)).
+        """
+        if paths.shape[1] != len(self.branches):
+            raise ValueError(
+                f"Required path of length {len(self.branches)}, got {paths.shape[1]}"
+            )
+        picked = self._branch_vecs[np.arange(len(self.branches)), paths]
+        return self._count_vec + picked.sum(axis=1)
 
 
 class Data:
@@ -101,10 +149,11 @@ class Data:
         self.classes = {}
 
     def read(self, filename):
-        xml = ET.parse(filename)
-        for xml_cls in xml.getroot().findall("class"):
-            cls = ClassTalents.from_xml(xml_cls)
-            self.classes[cls.name] = cls
+        for _, elem in ET.iterparse(filename):
+            if elem.tag == "class":
+                cls = ClassTalents.from_xml(elem)
+                self.classes[cls.name] = cls
+                elem.clear()
 
 
 Goal = namedtuple("Goal", "cls, priorities")
@@ -148,32 +197,30 @@ def main(argv):
         Goal(data.classes[n], parse_priorities(p))
         for n, p in zip(islice(opt.goal, 0, None, 2), islice(opt.goal, 1, None, 2))
     ]
-    
-    best_paths = list(product(range(2), repeat=7))
-    results = {
-        path: {g.cls.name: g.cls.count_path(path) for g in goals}
-        for path in best_paths
-    }
+
+    # Each priority is a sum of independent per-branch contributions, so the
+    # best paths are exactly the combinations of every branch's best options.
+    # Filter the options branch by branch instead of scoring all 128 paths.
+    prio_idx = [[step_index[s] for s in g.priorities] for g in goals]
+    options = np.ones((len(goals[0].cls.branches), 2), dtype=bool)
     for idx_priority in range(max((len(g.priorities) for g in goals))):
-        for g in goals:
+        for gi, g in enumerate(goals):
             try:
-                prio = g.priorities[idx_priority]
+                prio = prio_idx[gi][idx_priority]
             except IndexError:
                 continue
-            new_paths = []
-            current_max = 0
-            for path in best_paths:
-                val = results[path][g.cls.name][prio]
-                if val > current_max:
-                    new_paths = [path]
-                    current_max = val
-                elif val == current_max:
-                    new_paths.append(path)
-            best_paths = new_paths
-    for path in best_paths:
-        print(f"{path}:")
-        for g in goals:
-            print(f"\t{g.cls.name}:", results[path][g.cls.name])
+            gain = np.where(options, g.cls.branch_counts()[:, :, prio], -1)
+            options &= gain == gain.max(axis=1, keepdims=True)
+    paths = np.array(
+        list(product(*(np.flatnonzero(o) for o in options))), dtype=np.int8
+    ).reshape(-1, len(options))
+    results = np.empty((len(goals), len(paths), len(Step)), dtype=np.int8)
+    for gi, g in enumerate(goals):
+        results[gi] = g.cls.count_paths(paths)
+    for pi, path in enumerate(paths):
+        print(f"{tuple(path.tolist())}:")
+        for gi, g in enumerate(goals):
+            print(f"\t{g.cls.name}:", TalentCounter.from_array(results[gi, pi]))
 
 
 if __name__ == "__main__":
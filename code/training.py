@@ -4,11 +4,27 @@
 
 import argparse
 from collections import namedtuple
-import math
-import random
+from multiprocessing import Pool
+import os
 import sys
 import xml.etree.ElementTree as ET
 
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        return lambda f: f
+
+try:
+    from training_kernel import run_trials
+except ImportError:
+    run_trials = None
+
 
 class Tier:
     @classmethod
@@ -42,10 +58,11 @@ class Data:
         self.tiers = {}
 
     def read(self, filename):
-        xml = ET.parse(filename)
-        for xml_tier in xml.getroot().findall("tier"):
-            tier = Tier.from_xml(xml_tier)
-            self.tiers[tier.rarity] = tier
+        for _, elem in ET.iterparse(filename):
+            if elem.tag == "tier":
+                tier = Tier.from_xml(elem)
+                self.tiers[tier.rarity] = tier
+                elem.clear()
 
 
 Step = namedtuple("Step", "xp, chance")
@@ -56,26 +73,115 @@ steps = {
 }
 
 
-def compute(ascensions, steps, num_runs, step):
+@njit(cache=True)
+def _compute(asc_arr, steps, num_runs, step_xp, step_chance, seed):
     successes = 0
     levels = 0
+    # xorshift64; the slight modulo bias of drawing from it below is negligible
+    state = np.uint64(seed)
 
     for run in range(num_runs):
-        asc = ascensions[:]
+        cursor = 0
+        xp_left = asc_arr[0] if len(asc_arr) else 0
         level = 1
-        while asc and level < 8:
-            do_steps = min(steps, math.ceil(asc[0] / step.xp))
-            if random.randrange(100) < do_steps*step.chance:
+        while cursor < len(asc_arr) and level < 8:
+            do_steps = min(steps, (xp_left + step_xp - 1) // step_xp)
+            state ^= state << np.uint64(13)
+            state ^= state >> np.uint64(7)
+            state ^= state << np.uint64(17)
+            if state % np.uint64(100) < do_steps*step_chance:
                 level += 1
-            asc[0] -= do_steps*step.xp
-            if asc[0] <= 0:
-                del asc[0]
+            xp_left -= do_steps*step_xp
+            if xp_left <= 0:
+                cursor += 1
                 level += 1
+                if cursor < len(asc_arr):
+                    xp_left = asc_arr[cursor]
         if level >= 8:
             successes += 1
             level = 8
         levels += level
 
+    return successes, levels
+
+
+# Scalar trial loop: Numba-compiled if possible, else the Cython build if any
+_trial_kernel = _compute if HAVE_NUMBA else run_trials
+
+
+def _compute_batched(asc_arr, steps, num_runs, step_xp, step_chance, rng):
+    # Pure NumPy variant of _compute, simulating all runs in lockstep
+    level = np.ones(num_runs, dtype=np.int64)
+    idx = np.zeros(num_runs, dtype=np.intp)
+    remaining = np.tile(asc_arr, (num_runs, 1))
+    active = np.arange(num_runs)
+
+    while len(active):
+        cur = remaining[active, idx[active]]
+        do_steps = np.minimum(steps, -(-cur // step_xp))
+        level[active] += rng.integers(0, 100, size=len(active)) < do_steps*step_chance
+        cur -= do_steps*step_xp
+        remaining[active, idx[active]] = cur
+        done = cur <= 0
+        idx[active] += done
+        level[active] += done
+        active = active[(idx[active] < len(asc_arr)) & (level[active] < 8)]
+
+    level = np.minimum(level, 8)
+    return int((level == 8).sum()), int(level.sum())
+
+
+# Runs per worker task; fixed so that results do not depend on the job count
+RUNS_PER_TASK = 10000
+
+
+# Data shared by all tasks of one compute() call, set once per process
+_task_args = None
+
+
+def _init_worker(*args):
+    global _task_args
+    _task_args = args
+
+
+def _run_task(task):
+    seed, num_runs = task
+    asc_arr, steps, step_xp, step_chance = _task_args
+    rng = np.random.default_rng(seed)
+    if _trial_kernel is not None:
+        # xorshift state must be non-zero
+        seed = int(rng.integers(1, 2**63))
+        return _trial_kernel(asc_arr, steps, num_runs, step_xp, step_chance, seed)
+    return _compute_batched(asc_arr, steps, num_runs, step_xp, step_chance, rng)
+
+
+def compute(ascensions, steps, num_runs, step, rng, jobs=1):
+    # No copy when given the int64 array main() prepares
+    asc_arr = np.asarray(ascensions, dtype=np.int64)
+    if steps == 1:
+        # Single steps always train exactly one step at a constant chance until
+        # the ascension is used up, so a run is one binomial draw over all steps
+        # on top of the level gained from each completed ascension.
+        trials = int(((asc_arr + step.xp - 1) // step.xp).sum())
+        level_ups = rng.binomial(trials, step.chance/100, size=num_runs)
+        level = np.minimum(1 + len(asc_arr) + level_ups, 8)
+        successes, levels = int((level == 8).sum()), int(level.sum())
+    else:
+        task_runs = [RUNS_PER_TASK] * (num_runs // RUNS_PER_TASK)
+        if num_runs % RUNS_PER_TASK:
+            task_runs.append(num_runs % RUNS_PER_TASK)
+        seeds = rng.integers(2**63, size=len(task_runs))
+        tasks = list(zip(seeds, task_runs))
+        args = (asc_arr, steps, step.xp, step.chance)
+        if jobs > 1 and len(tasks) > 1:
+            with Pool(min(jobs, len(tasks)), initializer=_init_worker, initargs=args) as pool:
+                results = list(pool.imap_unordered(_run_task, tasks))
+        else:
+            _init_worker(*args)
+            results = [_run_task(task) for task in tasks]
+        successes = sum(r[0] for r in results)
+        levels = sum(r[1] for r in results)
+
     print("Steps:", steps, "Odds of maxing:", successes/num_runs*100, "Average level:", levels/num_runs)
 
 
@@ -96,6 +202,12 @@ def main(argv):
         type=int,
         default=1000,
     )
+    parser.add_argument(
+        "-j", "--jobs",
+        help="Number of worker processes",
+        type=int,
+        default=os.cpu_count(),
+    )
     parser.add_argument(
         "goal",
         help="Rarity to evaluate",
@@ -116,9 +228,12 @@ def main(argv):
     num_runs = opt.runs
     step = steps[opt.source]
 
-    random.seed(0)
-    compute(ascensions=data.tiers[goal].ascensions, steps=1, num_runs=num_runs, step=step)
-    compute(ascensions=data.tiers[goal].ascensions, steps=10, num_runs=num_runs, step=step)
+    asc_template = np.array(data.tiers[goal].ascensions, dtype=np.int64)
+    asc_template.flags.writeable = False
+
+    rng = np.random.default_rng(0)
+    compute(ascensions=asc_template, steps=1, num_runs=num_runs, step=step, rng=rng, jobs=opt.jobs)
+    compute(ascensions=asc_template, steps=10, num_runs=num_runs, step=step, rng=rng, jobs=opt.jobs)
 
 
 if __name__ == "__main__":
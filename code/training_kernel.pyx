@@ -0,0 +1,51 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+# Copyright (c) 2022 Petr Kmoch
+#
+# Distributed under the MIT license, see accompanying LICENSE file
+
+# Ahead-of-time compiled twin of training._compute, used when Numba is not
+# available. Build in place with: cythonize -i training_kernel.pyx
+
+from libc.stdint cimport int64_t, uint64_t
+
+
+cpdef tuple run_trials(
+    const int64_t[::1] asc_arr,
+    int64_t steps,
+    int64_t num_runs,
+    int64_t step_xp,
+    int64_t step_chance,
+    uint64_t seed,
+):
+    cdef int64_t successes = 0
+    cdef int64_t levels = 0
+    # xorshift64; the slight modulo bias of drawing from it below is negligible
+    cdef uint64_t state = seed
+    cdef Py_ssize_t n = asc_arr.shape[0]
+    cdef Py_ssize_t cursor
+    cdef int64_t run, level, xp_left, do_steps
+
+    with nogil:
+        for run in range(num_runs):
+            cursor = 0
+            xp_left = asc_arr[0] if n else 0
+            level = 1
+            while cursor < n and level < 8:
+                do_steps = min(steps, (xp_left + step_xp - 1) // step_xp)
+                state ^= state << 13
+                state ^= state >> 7
+                state ^= state << 17
+                if <int64_t>(state % 100) < do_steps*step_chance:
+                    level += 1
+                xp_left -= do_steps*step_xp
+                if xp_left <= 0:
+                    cursor += 1
+                    level += 1
+                    if cursor < n:
+                        xp_left = asc_arr[cursor]
+            if level >= 8:
+                successes += 1
+                level = 8
+            levels += level
+
+    return successes, levels